@@ -18,7 +18,7 @@ class DataHandler(object):
         """
         raise NotImplementedError('get_bars not implemented.')
 
-    @absractmethod
+    @abstractmethod
     def update_bars(self):
         """
         Pushes the latest bar to the latest symbol structure for all
@@ -29,7 +29,7 @@ class DataHandler(object):
 class HistoricCSVDataHandler(DataHandler):
     """ HistoricCSVDataHanlder handles data in CSV files. """
 
-    def __init__(self, events, csv_dir, symbol_list):
+    def __init__(self, events, csv_dir, symbol_list, comb_index=None):
         """
         Initializes the data handler. All files are of the form
         '{symbol}.csv'.
@@ -38,13 +38,19 @@ class HistoricCSVDataHandler(DataHandler):
         events - the Event queue
         csv_dir - absolute path to data
         symbol_list - a list of symbol strings
+        comb_index - optional timestamp index to align every symbol to,
+                     e.g. the index of the full universe when only a
+                     shard of it is loaded. Defaults to the union of the
+                     timestamps of all symbols.
         """
         self.events = events
         self.csv_dir = csv_dir
         self.symbol_list = symbol_list
+        self.comb_index = comb_index
 
         self.symbol_data = {}
         self.latest_symbol_data = {}
+        self.bar_generators = {}
         self.continue_backtest = True
 
         self._open_convert_csv_files()
@@ -60,17 +66,22 @@ class HistoricCSVDataHandler(DataHandler):
             self.symbol_data[s] = pd.io.parsers.read_csv(
                     os.path.join(self.csv_dir, '%s.csv' % s),
                     header=0, index_col=0,
-                    names=['datetime', 'open', 'low', 'high', 'close'])
+                    names=['datetime', 'open', 'low', 'high', 'close',
+                           'volume'])
             if comb_index is None:
                 comb_index = self.symbol_data[s].index
             else:
-                comb_index.union(self.symbol_data[s].index)
+                comb_index = comb_index.union(self.symbol_data[s].index)
 
             self.latest_symbol_data[s] = []
 
+        if self.comb_index is None:
+            self.comb_index = comb_index
+
         for s in self.symbol_list:
             self.symbol_data[s] = self.symbol_data[s].reindex(
-                    index=comb_index, method='pad').iterrows()
+                    index=self.comb_index, method='pad').iterrows()
+            self.bar_generators[s] = self._get_new_bar(s)
 
     def _get_new_bar(self, symbol):
         """
@@ -79,8 +90,8 @@ class HistoricCSVDataHandler(DataHandler):
         """
         for b in self.symbol_data[symbol]:
             yield tuple([symbol, datetime.datetime.strptime(
-                b[0], '%Y-%m-%d %H:%M:%S'), b[1][0], b[1][1],
-                b[1][2], b[1][3], b[1][4]])
+                b[0], '%Y-%m-%d %H:%M:%S'), b[1]['open'], b[1]['low'],
+                b[1]['high'], b[1]['close'], b[1]['volume']])
 
     def get_latest_bars(self, symbol, N=1):
         """
@@ -97,13 +108,15 @@ class HistoricCSVDataHandler(DataHandler):
     def update_bars(self):
         """
         Pushes the latest bar to the latest_symbol_data structure.
+        No MarketEvent is sent once the data has run out.
         """
         for s in self.symbol_list:
             try:
-                bar = self._get_new_bars(s).next()
+                bar = next(self.bar_generators[s])
             except StopIteration:
                 self.continue_backtest = False
             else:
                 if bar is not None:
                     self.latest_symbol_data[s].append(bar)
-        self.events.put(MarketEvent())
+        if self.continue_backtest:
+            self.events.put(MarketEvent())
@@ -5,7 +5,7 @@ class Event(object):
 class MarketEvent(Event):
     """ Handles market update event. """
     def __init__(self):
-        self.type = 'Market'
+        self.type = 'MARKET'
 
 class SignalEvent(Event):
     """ Handles event of sending a strategy signal. """
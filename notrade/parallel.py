@@ -0,0 +1,279 @@
+import datetime
+import heapq
+import os
+import os.path
+import queue
+
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .data import DataHandler, HistoricCSVDataHandler
+from .event import MarketEvent, SignalEvent
+
+def _partition(symbol_list, shards):
+    """
+    Splits the symbol list round-robin into at most the given number
+    of shards. Each shard keeps the symbols in their original order.
+    """
+    return [symbol_list[i::shards] for i in range(shards)
+            if symbol_list[i::shards]]
+
+def _read_index(csv_dir, symbol_list):
+    """
+    Reads only the timestamp column of each CSV in a shard and combines
+    them the same way HistoricCSVDataHandler does. Kept at module level
+    so it can be sent to a process pool.
+    """
+    comb_index = None
+    for s in symbol_list:
+        index = pd.Index(pd.io.parsers.read_csv(
+                os.path.join(csv_dir, '%s.csv' % s),
+                header=0, usecols=[0]).iloc[:, 0])
+        comb_index = index if comb_index is None \
+                           else comb_index.union(index)
+    return comb_index
+
+def _run_shard(csv_dir, symbol_list, comb_index, strategy_cls):
+    """
+    Runs the data handling and signal generation half of the
+    backtest loop for a single shard of symbols. Kept at module
+    level so it can be sent to a process pool.
+
+    Parameters:
+    csv_dir - absolute path to data
+    symbol_list - the symbols in this shard
+    comb_index - the timestamp index of the full universe, so the
+                 shard sees the same bars and stops on the same bar
+                 as a single-process run
+    strategy_cls - a Strategy class taking (bars, events)
+
+    Returns:
+    signals, prices - (datetime, symbol, signal_type) tuples in the
+                      order the signals were generated, and for every
+                      symbol that had at least one signal an array of
+                      its (open, low, high, close, volume) bars. Plain
+                      tuples and arrays are far cheaper to send back
+                      than the event and bar objects.
+    """
+    events = queue.Queue()
+    bars = HistoricCSVDataHandler(events, csv_dir, symbol_list,
+                                  comb_index)
+    strategy = strategy_cls(bars, events)
+    signals = []
+
+    while True:
+        if bars.continue_backtest:
+            bars.update_bars()
+        else:
+            break
+
+        while True:
+            try:
+                event = events.get(False)
+            except queue.Empty:
+                break
+            else:
+                if event is not None:
+                    if event.type == 'MARKET':
+                        strategy.calculate_signals(event)
+                    elif event.type == 'SIGNAL':
+                        signals.append((event.datetime, event.symbol,
+                                        event.signal_type))
+
+    traded = set(s for _, s, _ in signals)
+    prices = {s: np.array([b[2:] for b in bars.latest_symbol_data[s]])
+              for s in traded}
+    return signals, prices
+
+class ShardedDataHandler(DataHandler):
+    """
+    ShardedDataHandler is the coordinator's view of the market data
+    in a ShardedBacktest. It steps through the timestamp index of the
+    full universe without reading the bars itself; the prices of the
+    symbols that traded are filled in from the workers, and bars are
+    only built for the symbols the portfolio or broker ask about.
+    """
+
+    def __init__(self, events, csv_dir, symbol_list):
+        """
+        Initializes the data handler. Nothing is read until the
+        ShardedBacktest runs.
+
+        Parameters:
+        events - the Event queue
+        csv_dir - absolute path to data
+        symbol_list - a list of symbol strings
+        """
+        self.events = events
+        self.csv_dir = csv_dir
+        self.symbol_list = symbol_list
+
+        self.comb_index = None
+        self.symbol_data = {}
+        self.datetimes = []
+        self.current_bar = -1
+        self.current_datetime = None
+        self.continue_backtest = True
+
+    def get_latest_bars(self, symbol, N=1):
+        """
+        Returns the last N bars up to the current bar, or fewer if
+        unavailable. Only symbols with at least one signal have bars.
+        """
+        try:
+            prices = self.symbol_data[symbol]
+        except KeyError:
+            print('{} is not available in the data set.'.format(symbol))
+        else:
+            start = max(0, self.current_bar + 1 - N)
+            return [tuple([symbol, self.datetimes[i]]) + tuple(prices[i])
+                    for i in range(start, self.current_bar + 1)]
+
+    def istick(self):
+        """ Bars are used rather than ticks. """
+        return False
+
+    def get_last_close(self, symbol):
+        """ Returns the close of the current bar of a traded symbol. """
+        return self.get_latest_bars(symbol)[-1][5]
+
+    def update_bars(self):
+        """
+        Moves on to the next timestamp of the full universe. No
+        MarketEvent is sent once the data has run out.
+        """
+        if self.current_bar + 1 >= len(self.comb_index):
+            self.continue_backtest = False
+            return
+        self.current_bar += 1
+        self.current_datetime = datetime.datetime.strptime(
+                self.comb_index[self.current_bar], '%Y-%m-%d %H:%M:%S')
+        self.datetimes.append(self.current_datetime)
+        self.events.put(MarketEvent())
+
+class ShardedBacktest(object):
+    """
+    Runs a single backtest with the data handling and signal
+    generation spread over worker processes. This is only valid for
+    strategies whose signals for one symbol do not depend on any other
+    symbol, and which emit the signals for a bar in symbol_list order
+    (as BuyAndHoldStrategy does). Signals for the same timestamp are
+    merged in that order.
+
+    Each worker runs its own HistoricCSVDataHandler and Strategy over
+    a shard of the symbol list, aligned to the timestamp index of the
+    full universe. The coordinator then replays the merged signals
+    bar by bar through a single portfolio and ExecutionHandler, so
+    they see the same events in the same order as a single-process
+    run, and any portfolio-level constraint they apply covers the
+    whole universe.
+
+    The portfolio must provide update_timeindex, update_signal and
+    update_fill, as used by the event loop in backtest.py. The
+    Portfolio in portfolio.py does not implement that interface yet;
+    adapting it is out of scope here.
+    """
+
+    def __init__(self, events, bars, strategy_cls, portfolio, broker,
+            processes=None):
+        """
+        Initializes the sharded backtest.
+
+        Parameters:
+        events - the Event queue shared by bars, portfolio and broker
+        bars - a ShardedDataHandler for the full symbol list, which
+               the portfolio and broker use for prices
+        strategy_cls - a Strategy class taking (bars, events), run
+                       once per shard in the workers
+        portfolio - the portfolio object, see above
+        broker - the ExecutionHandler object
+        processes - number of worker processes, defaults to the
+                    number of CPUs
+        """
+        if processes is not None and (isinstance(processes, bool) or
+                not isinstance(processes, int) or processes < 1):
+            raise ValueError('processes must be a positive integer.')
+
+        self.events = events
+        self.bars = bars
+        self.strategy_cls = strategy_cls
+        self.portfolio = portfolio
+        self.broker = broker
+        self.processes = processes
+
+    def _generate_signals(self):
+        """
+        Builds the timestamp index of the full universe, then runs
+        every shard against it on the process pool. The signals are
+        merged into one stream; ties on the timestamp are broken by
+        the position of the symbol in the full symbol list, which is
+        the order a single Strategy would have put them on the queue.
+        """
+        processes = self.processes or os.cpu_count()
+        shards = _partition(self.bars.symbol_list, processes)
+        n = len(shards)
+        with ProcessPoolExecutor(max_workers=n) as pool:
+            comb_index = None
+            for index in pool.map(_read_index, [self.bars.csv_dir] * n,
+                                  shards):
+                comb_index = index if comb_index is None \
+                                   else comb_index.union(index)
+            results = list(pool.map(_run_shard,
+                                    [self.bars.csv_dir] * n, shards,
+                                    [comb_index] * n,
+                                    [self.strategy_cls] * n))
+
+        self.bars.comb_index = comb_index
+        for _, symbol_data in results:
+            self.bars.symbol_data.update(symbol_data)
+
+        order = {s: i for i, s in enumerate(self.bars.symbol_list)}
+        merged = heapq.merge(*[signals for signals, _ in results],
+                             key=lambda e: (e[0], order[e[1]]))
+        return (SignalEvent(s, dt, signal_type)
+                for dt, s, signal_type in merged)
+
+    def run(self):
+        """
+        Generates the signals in parallel, then runs the portfolio
+        half of the backtest loop. On each MarketEvent the signals for
+        that bar are put on the queue, in place of the Strategy.
+        """
+        signals = self._generate_signals()
+        pending = next(signals, None)
+
+        while True:
+            if self.bars.continue_backtest:
+                self.bars.update_bars()
+            else:
+                break
+
+            while True:
+                try:
+                    event = self.events.get(False)
+                except queue.Empty:
+                    break
+                else:
+                    if event is not None:
+                        if event.type == 'MARKET':
+                            now = self.bars.current_datetime
+                            while pending is not None and \
+                                    pending.datetime <= now:
+                                self.events.put(pending)
+                                pending = next(signals, None)
+                            self.portfolio.update_timeindex(event)
+                        elif event.type == 'SIGNAL':
+                            self.portfolio.update_signal(event)
+                        elif event.type == 'ORDER':
+                            self.broker.execute_order(event)
+                        elif event.type == 'FILL':
+                            self.portfolio.update_fill(event)
+
+        # The workers and the coordinator share one timestamp index, so
+        # every signal should have been replayed by now.
+        if pending is not None:
+            dropped = 1 + sum(1 for _ in signals)
+            raise RuntimeError('{} signals fall after the last bar; the '
+                               'shard calendars diverged.'.format(dropped))
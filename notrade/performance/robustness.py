@@ -0,0 +1,206 @@
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+def _sharpe_ratios(returns, periods=252):
+    """
+    Calculates the Sharpe ratio of every row of a 2-D matrix of
+    returns, using the same zero benchmark as calculate_sharpe_ratio.
+
+    Parameters:
+    returns - a 2-D numpy array, one resampled returns path per row
+    periods - Daily (252), Hourly (252 * 6.5), Minutely(252 * 6.5 * 60), etc
+    """
+    std = np.std(returns, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.sqrt(periods) * np.mean(returns, axis=1) / std
+    sharpe[std == 0] = np.nan
+    return sharpe
+
+def _drawdowns(returns):
+    """
+    Calculates the largest peak-to-trough drawdown and the longest
+    drawdown duration of every row of a 2-D matrix of returns. The
+    equity curve of each row is compounded from a starting value of 1,
+    and the drawdown is taken as a fraction of the high water mark.
+
+    Parameters:
+    returns - a 2-D numpy array, one resampled returns path per row
+
+    Returns:
+    drawdown, duration - 1-D arrays with one entry per row
+    """
+    equity = np.cumprod(1.0 + returns, axis=1)
+    hwm = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    drawdown = (hwm - equity) / hwm
+
+    # The duration at t is the distance to the last bar at the high
+    # water mark, found by carrying the index of that bar forward.
+    steps = np.arange(1, returns.shape[1] + 1)
+    at_peak = np.where(drawdown == 0, steps, 0)
+    last_peak = np.maximum.accumulate(at_peak, axis=1)
+    duration = steps - last_peak
+    return drawdown.max(axis=1), duration.max(axis=1)
+
+def _block_bootstrap(returns, n, block_size, random_state):
+    """
+    Draws n circular block bootstrap resamples of a returns array,
+    each the same length as the original.
+
+    Parameters:
+    returns - a 1-D numpy array of period returns
+    n - number of resamples to draw
+    block_size - length of each contiguous block
+    random_state - a numpy RandomState
+    """
+    length = len(returns)
+    n_blocks = int(np.ceil(length / float(block_size)))
+    starts = random_state.randint(0, length, size=(n, n_blocks))
+    idx = (starts[:, :, np.newaxis] + np.arange(block_size)) % length
+    idx = idx.reshape(n, n_blocks * block_size)[:, :length]
+    return returns[idx]
+
+def _trade_shuffle(returns, n, replace, random_state):
+    """
+    Draws n reorderings of a list of trade returns. Without
+    replacement every row is a permutation of the trades; with
+    replacement the trades are sampled independently.
+
+    Parameters:
+    returns - a 1-D numpy array of per-trade returns
+    n - number of resamples to draw
+    replace - whether to sample trades with replacement
+    random_state - a numpy RandomState
+    """
+    length = len(returns)
+    if replace:
+        idx = random_state.randint(0, length, size=(n, length))
+    else:
+        idx = np.argsort(random_state.random_sample((n, length)), axis=1)
+    return returns[idx]
+
+def _is_positive_int(value):
+    """ Returns True if value is an integer (but not a bool) >= 1. """
+    return isinstance(value, (int, np.integer)) and \
+        not isinstance(value, bool) and value >= 1
+
+def _simulate_chunk(returns, n, method, block_size, replace, periods, seed):
+    """
+    Runs a single chunk of resamples and calculates the statistics
+    of every path. Kept at module level so it can be sent to a
+    process pool.
+
+    Returns:
+    sharpe, drawdown, duration - 1-D arrays with n entries each
+    """
+    random_state = np.random.RandomState(seed)
+    if method == 'block':
+        paths = _block_bootstrap(returns, n, block_size, random_state)
+    elif method == 'shuffle':
+        paths = _trade_shuffle(returns, n, replace, random_state)
+    else:
+        raise ValueError('Unknown resampling method: {}'.format(method))
+    drawdown, duration = _drawdowns(paths)
+    if method == 'shuffle' and not replace:
+        # A permutation has the same mean and std as the original
+        # trades, so there is no Sharpe distribution to report.
+        sharpe = np.full(n, np.nan)
+    else:
+        sharpe = _sharpe_ratios(paths, periods)
+    return sharpe, drawdown, duration
+
+def monte_carlo(returns, n=10000, method='block', block_size=20,
+        replace=False, periods=252, chunk_size=1000, processes=None,
+        seed=None):
+    """
+    Resamples a returns series or trade list n times and calculates
+    the Sharpe ratio, maximum drawdown and drawdown duration of every
+    resampled path. Each chunk of resamples is held as a single 2-D
+    matrix, so chunk_size bounds the memory used at any one time.
+
+    'block' runs a circular block bootstrap, which keeps the serial
+    correlation within each block. 'shuffle' reorders the trades;
+    reordering alone leaves the Sharpe ratio unchanged, so the sharpe
+    column is NaN unless replace=True.
+
+    Leading and trailing NaNs (e.g. from pct_change) are dropped. NaNs
+    in the middle of the series raise a ValueError, since dropping them
+    would join returns that were not adjacent.
+
+    Parameters:
+    returns - a pandas Series or array of period (or per-trade) returns
+    n - number of resamples
+    method - 'block' or 'shuffle'
+    block_size - length of each block for the block bootstrap
+    replace - sample trades with replacement when shuffling
+    periods - Daily (252), Hourly (252 * 6.5), Minutely(252 * 6.5 * 60), etc
+    chunk_size - maximum number of resamples held in memory per chunk
+    processes - number of worker processes, or None to run in-process
+    seed - seed for reproducible results, identical with or without
+           a process pool
+
+    Returns:
+    a pandas DataFrame with sharpe, drawdown and duration columns,
+    one row per resample. drawdown is the fraction lost from the high
+    water mark, between 0 and 1; duration is in periods.
+    """
+    returns = np.asarray(returns, dtype=float)
+    valid = np.flatnonzero(~np.isnan(returns))
+    if len(valid):
+        returns = returns[valid[0]:valid[-1] + 1]
+    else:
+        returns = returns[:0]
+    if np.isnan(returns).any():
+        raise ValueError('returns contains NaNs between valid values.')
+    if len(returns) < 2:
+        raise ValueError('At least two returns are needed to resample.')
+    if method not in ('block', 'shuffle'):
+        raise ValueError('Unknown resampling method: {}'.format(method))
+    if not _is_positive_int(n):
+        raise ValueError('n must be a positive integer.')
+    if not _is_positive_int(chunk_size):
+        raise ValueError('chunk_size must be a positive integer.')
+    if processes is not None and not _is_positive_int(processes):
+        raise ValueError('processes must be a positive integer.')
+    if method == 'block' and not (_is_positive_int(block_size)
+                                  and block_size <= len(returns)):
+        raise ValueError('block_size must be between 1 and the number '
+                         'of returns.')
+
+    # Every chunk gets its own seed drawn up front, so the result
+    # does not depend on the order in which the chunks are run.
+    sizes = [chunk_size] * (n // chunk_size)
+    if n % chunk_size:
+        sizes.append(n % chunk_size)
+    seeds = np.random.RandomState(seed).randint(0, 2**31 - 1,
+                                                size=len(sizes))
+    args = [(returns, size, method, block_size, replace, periods, s)
+            for size, s in zip(sizes, seeds)]
+
+    if processes is None:
+        results = [_simulate_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*args)))
+
+    sharpe, drawdown, duration = (np.concatenate(r) for r in zip(*results))
+    return pd.DataFrame({'sharpe': sharpe, 'drawdown': drawdown,
+                         'duration': duration},
+                        columns=['sharpe', 'drawdown', 'duration'])
+
+def confidence_intervals(results, alpha=0.05):
+    """
+    Summarises the distributions returned by monte_carlo as the
+    median and the two-sided (1 - alpha) percentile interval.
+
+    Parameters:
+    results - a pandas DataFrame as returned by monte_carlo
+    alpha - significance level, e.g. 0.05 for a 95% interval
+
+    Returns:
+    a pandas DataFrame indexed by lower, median and upper
+    """
+    summary = results.quantile([alpha / 2.0, 0.5, 1.0 - alpha / 2.0])
+    summary.index = ['lower', 'median', 'upper']
+    return summary
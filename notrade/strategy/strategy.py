@@ -20,7 +20,7 @@ class Strategy(object):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def calculate_signals(self):
+    def calculate_signals(self, event):
         """ Calculates signals based on bars given during the constructor. """
         raise NotImplementedError('calculate_signals() not implemented')
 
@@ -47,7 +47,7 @@ class BuyAndHoldStrategy(Strategy):
         # Once buy and hold signal is given, boolen in dictionary set to True
         self.bought = {symbol: False for symbol in self.symbol_list}
 
-    def calculate_symbols(self):
+    def calculate_signals(self, event):
         """
         Generate a single buy signal for each symbol.
 
@@ -57,7 +57,7 @@ class BuyAndHoldStrategy(Strategy):
         if event.type == 'MARKET':
             for s in self.symbol_list:
                 bars = self.bars.get_latest_bars(s, N=1)
-                if bars:
+                if bars and not self.bought[s]:
                     # (Symbol, Datetime, Type = LONG, SHORT or EXIT)
                     signal = SignalEvent(bars[0][0], bars[0][1], 'LONG')
                     self.events.put(signal)
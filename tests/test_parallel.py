@@ -0,0 +1,187 @@
+import os
+import queue
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from notrade.data import HistoricCSVDataHandler
+from notrade.event import FillEvent, OrderEvent, SignalEvent
+from notrade.parallel import ShardedBacktest, ShardedDataHandler, _run_shard
+from notrade.strategy.strategy import BuyAndHoldStrategy
+
+SYMBOLS = ['A', 'B', 'C', 'D', 'E']
+
+class MomentumStrategy(object):
+    """ Goes LONG on an up close and SHORT on a down close. """
+    def __init__(self, bars, events):
+        self.bars = bars
+        self.symbol_list = self.bars.symbol_list
+        self.events = events
+
+    def calculate_signals(self, event):
+        if event.type == 'MARKET':
+            for s in self.symbol_list:
+                bars = self.bars.get_latest_bars(s, N=2)
+                if len(bars) == 2 and bars[0][5] == bars[0][5]:
+                    direction = 'LONG' if bars[1][5] > bars[0][5] else 'SHORT'
+                    self.events.put(SignalEvent(s, bars[1][1], direction))
+
+class RecordingPortfolio(object):
+    """ Turns every signal into an order and records signals and fills. """
+    def __init__(self, events):
+        self.events = events
+        self.signals = []
+        self.fills = []
+
+    def update_timeindex(self, event):
+        pass
+
+    def update_signal(self, event):
+        self.signals.append(event)
+        direction = 'BUY' if event.signal_type == 'LONG' else 'SELL'
+        self.events.put(OrderEvent(event.symbol, 'MKT', 100, direction))
+
+    def update_fill(self, event):
+        self.fills.append((event.timeindex, event.symbol, event.direction))
+
+class BarTimeBroker(object):
+    """ Fills every order at the timestamp of the current bar. """
+    def __init__(self, events, bars):
+        self.events = events
+        self.bars = bars
+
+    def execute_order(self, event):
+        timeindex = self.bars.get_latest_bars(event.symbol)[-1][1]
+        self.events.put(FillEvent(timeindex, event.symbol, 'ARCA',
+                event.quantity, event.direction, None, commission=0))
+
+@pytest.fixture
+def csv_dir(tmpdir):
+    """ Writes CSVs for symbols that trade on staggered dates. """
+    rand = np.random.RandomState(0)
+    days = ['2016-01-%02d 00:00:00' % d for d in range(1, 21)]
+    for i, s in enumerate(SYMBOLS):
+        dates = days[i:len(days) - 2 * i:(i % 2) + 1]
+        with open(os.path.join(str(tmpdir), '%s.csv' % s), 'w') as f:
+            f.write('datetime,open,low,high,close,volume\n')
+            for d in dates:
+                p = 100 + rand.normal()
+                f.write('%s,%f,%f,%f,%f,%d\n' % (d, p, p, p, p, 1000))
+    return str(tmpdir)
+
+def _single_process(csv_dir, strategy_cls, symbols=SYMBOLS):
+    """ Runs the backtest.py event loop on one core. """
+    events = queue.Queue()
+    bars = HistoricCSVDataHandler(events, csv_dir, symbols)
+    strategy = strategy_cls(bars, events)
+    portfolio = RecordingPortfolio(events)
+    broker = BarTimeBroker(events, bars)
+
+    while bars.continue_backtest:
+        bars.update_bars()
+        while True:
+            try:
+                event = events.get(False)
+            except queue.Empty:
+                break
+            if event.type == 'MARKET':
+                strategy.calculate_signals(event)
+                portfolio.update_timeindex(event)
+            elif event.type == 'SIGNAL':
+                portfolio.update_signal(event)
+            elif event.type == 'ORDER':
+                broker.execute_order(event)
+            elif event.type == 'FILL':
+                portfolio.update_fill(event)
+    return portfolio.signals, portfolio.fills
+
+def _sharded(csv_dir, strategy_cls, processes, symbols=SYMBOLS):
+    events = queue.Queue()
+    bars = ShardedDataHandler(events, csv_dir, symbols)
+    portfolio = RecordingPortfolio(events)
+    broker = BarTimeBroker(events, bars)
+    backtest = ShardedBacktest(events, bars, strategy_cls, portfolio,
+                               broker, processes=processes)
+    backtest.run()
+    return portfolio.signals, portfolio.fills
+
+def _key(signals):
+    return [(e.datetime, e.symbol, e.signal_type) for e in signals]
+
+@pytest.mark.parametrize('strategy_cls',
+                         [BuyAndHoldStrategy, MomentumStrategy])
+@pytest.mark.parametrize('processes', [1, 2, 3])
+def test_sharded_matches_single_process(csv_dir, strategy_cls, processes):
+    signals, fills = _single_process(csv_dir, strategy_cls)
+    sharded_signals, sharded_fills = _sharded(csv_dir, strategy_cls,
+                                              processes)
+    assert signals
+    assert _key(sharded_signals) == _key(signals)
+    assert sharded_fills == fills
+
+def test_shard_uses_full_universe_calendar(csv_dir):
+    bars = HistoricCSVDataHandler(queue.Queue(), csv_dir, SYMBOLS)
+    own = HistoricCSVDataHandler(queue.Queue(), csv_dir, ['E'])
+    assert len(own.comb_index) < len(bars.comb_index)
+
+    signals, prices = _run_shard(csv_dir, ['E'], bars.comb_index,
+                                 MomentumStrategy)
+    assert signals
+    assert len(prices['E']) == len(bars.comb_index)
+    assert all(dt.strftime('%Y-%m-%d %H:%M:%S') in bars.comb_index
+               for dt, _, _ in signals)
+
+@pytest.mark.parametrize('processes', [0, -1, 1.5, True])
+def test_invalid_processes(processes):
+    with pytest.raises(ValueError):
+        ShardedBacktest(queue.Queue(), None, MomentumStrategy, None, None,
+                        processes=processes)
+
+def test_leftover_signals_raise(csv_dir, monkeypatch):
+    events = queue.Queue()
+    bars = ShardedDataHandler(events, csv_dir, SYMBOLS)
+    backtest = ShardedBacktest(events, bars, MomentumStrategy,
+                               RecordingPortfolio(events),
+                               BarTimeBroker(events, bars), processes=1)
+    # Stop the coordinator one bar early, as if its calendar diverged.
+    update_bars = bars.update_bars
+    def short_update_bars():
+        if bars.current_bar + 2 >= len(bars.comb_index):
+            bars.continue_backtest = False
+        else:
+            update_bars()
+    monkeypatch.setattr(bars, 'update_bars', short_update_bars)
+    with pytest.raises(RuntimeError):
+        backtest.run()
+
+def test_sharded_is_faster(tmpdir):
+    rand = np.random.RandomState(1)
+    days = [str(d) for d in
+            pd.date_range('2010-01-01', periods=300, freq='D')]
+    symbols = ['S%d' % i for i in range(40)]
+    for s in symbols:
+        with open(os.path.join(str(tmpdir), '%s.csv' % s), 'w') as f:
+            f.write('datetime,open,low,high,close,volume\n')
+            for d, p in zip(days, 100 + rand.normal(size=len(days))):
+                f.write('%s,%f,%f,%f,%f,%d\n' % (d, p, p, p, p, 1000))
+
+    def best_of_three(run, *args):
+        times = []
+        for _ in range(3):
+            start = time.time()
+            run(str(tmpdir), MomentumStrategy, *args)
+            times.append(time.time() - start)
+        return min(times)
+
+    cpus = os.cpu_count() or 1
+    single_time = best_of_three(_single_process, symbols)
+    sharded_time = best_of_three(_sharded, cpus, symbols)
+
+    if cpus >= 2:
+        assert sharded_time < single_time
+    else:
+        # The coordinator no longer repeats the data handling, so even
+        # on one core sharding adds little over the single-process run.
+        assert sharded_time < 1.5 * single_time
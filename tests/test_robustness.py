@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+import pytest
+
+from notrade.performance.robustness import (_block_bootstrap, _drawdowns,
+                                            _trade_shuffle, monte_carlo)
+
+def _loop_drawdown(returns):
+    """ Fractional drawdown and duration computed bar by bar. """
+    equity, hwm = 1.0, 1.0
+    max_dd, duration, max_duration = 0.0, 0, 0
+    for r in returns:
+        equity *= 1.0 + r
+        hwm = max(hwm, equity)
+        dd = (hwm - equity) / hwm
+        duration = 0 if dd == 0 else duration + 1
+        max_dd = max(max_dd, dd)
+        max_duration = max(max_duration, duration)
+    return max_dd, max_duration
+
+@pytest.fixture
+def returns():
+    return np.random.RandomState(0).normal(0.0005, 0.01, 252 * 3)
+
+def test_drawdowns_match_loop():
+    paths = np.array([[0.1, -0.5, 0.2, 0.0, 1.0, -0.1],
+                      [-0.1, -0.1, 0.5, -0.2, 0.1, 0.3]])
+    drawdown, duration = _drawdowns(paths)
+    for i, path in enumerate(paths):
+        dd, dur = _loop_drawdown(path)
+        assert drawdown[i] == pytest.approx(dd)
+        assert duration[i] == dur
+    assert drawdown[0] == pytest.approx(0.5)
+    assert duration[0] == 3
+
+def test_drawdowns_match_loop_random(returns):
+    paths = returns.reshape(3, -1)
+    drawdown, duration = _drawdowns(paths)
+    for i, path in enumerate(paths):
+        dd, dur = _loop_drawdown(path)
+        assert drawdown[i] == pytest.approx(dd)
+        assert duration[i] == dur
+
+def test_seed_reproducible_with_process_pool(returns):
+    serial = monte_carlo(returns, n=2500, chunk_size=1000, seed=7)
+    pooled = monte_carlo(returns, n=2500, chunk_size=1000, seed=7,
+                         processes=2)
+    assert serial.equals(pooled)
+
+def test_seed_reproducible_across_chunk_sizes(returns):
+    # Both produce a single chunk of 1000, so share the same chunk seed.
+    a = monte_carlo(returns, n=1000, chunk_size=1000, seed=7)
+    b = monte_carlo(returns, n=1000, chunk_size=5000, seed=7)
+    assert a.equals(b)
+
+def test_shuffle_keeps_returns_and_has_no_sharpe(returns):
+    trades = returns[:40]
+    result = monte_carlo(trades, n=50, method='shuffle', seed=3)
+    assert result['sharpe'].isnull().all()
+    assert result['drawdown'].nunique() > 1
+
+    # Every row of the underlying resample is a permutation.
+    paths = _trade_shuffle(trades, 50, False, np.random.RandomState(3))
+    for path in paths:
+        assert np.array_equal(np.sort(path), np.sort(trades))
+
+def test_block_bootstrap_blocks_are_contiguous_and_circular():
+    returns = np.arange(10, dtype=float)
+    paths = _block_bootstrap(returns, 200, 4, np.random.RandomState(0))
+    assert paths.shape == (200, 10)
+    wrapped = False
+    for path in paths:
+        for start in range(0, 10, 4):
+            block = path[start:start + 4]
+            assert np.array_equal(np.diff(block) % 10,
+                                  np.ones(len(block) - 1))
+            wrapped |= bool((np.diff(block) == -9).any())
+    assert wrapped
+
+@pytest.mark.parametrize('kwargs', [
+    dict(block_size=10000),
+    dict(n=10.5),
+    dict(n=0),
+    dict(chunk_size=0),
+    dict(method='jackknife'),
+])
+def test_invalid_arguments(returns, kwargs):
+    with pytest.raises(ValueError):
+        monte_carlo(returns, **kwargs)
+
+def test_interior_nans_raise(returns):
+    returns = returns.copy()
+    returns[100] = np.nan
+    with pytest.raises(ValueError):
+        monte_carlo(returns)
+
+def test_edge_nans_are_dropped(returns):
+    padded = np.r_[np.nan, returns, np.nan]
+    assert monte_carlo(padded, n=100, seed=1).equals(
+        monte_carlo(returns, n=100, seed=1))
+
+def test_ten_thousand_resamples_take_seconds():
+    returns = np.random.RandomState(1).normal(0.0005, 0.01, 252 * 5)
+    start = time.time()
+    result = monte_carlo(returns, n=10000, seed=1)
+    assert len(result) == 10000
+    assert time.time() - start < 10